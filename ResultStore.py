@@ -0,0 +1,388 @@
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from ZweikanalResultClass import ZweikanalResult
+
+# Ausrichtung der Arrays im Shared-Memory-Segment in Bytes
+_ALIGN = 64
+# Fester Segmentanfang: 8 Byte Headerlänge, 8 Byte PID des erzeugenden Prozesses
+_PREFIX_BYTES = 16
+# Version des Segmentaufbaus; bei jeder Änderung an Header oder `ZweikanalResult`-Feldern erhöhen.
+# Sie ist Teil des Segmentnamens, sodass Prozesse mit unterschiedlichem Stand keine Segmente teilen.
+_LAYOUT_VERSION = 3
+# Maximale Wartezeit in Sekunden auf ein Segment, das angelegt, aber noch nicht auf seine Größe gesetzt ist
+_OPEN_RETRY = 1.0
+
+def _openSharedMemory(name, create=False, size=0):
+    '''
+    Erzeugt oder öffnet ein Shared-Memory-Segment ohne Überwachung durch den Resource-Tracker.
+
+    Die Segmente werden von mehreren Worker-Prozessen gemeinsam genutzt. Der Resource-Tracker
+    würde sie beim Ende eines beliebigen Prozesses entfernen; das Entfernen übernimmt daher
+    ausschließlich der erzeugende Prozess (`ResultStore.clear()`, Verdrängung) bzw.
+    `ResultStore.cleanupStale()` für Segmente beendeter Prozesse. Vor Python 3.13 gibt es den
+    Parameter `track` nicht, dort wird die Registrierung direkt wieder aufgehoben.
+
+    Args:
+        name (str): Name des Shared-Memory-Segments
+        create (bool): Neues Segment erzeugen statt ein bestehendes zu öffnen
+        size (int): Größe eines neuen Segments in Bytes
+
+    Returns:
+        shared_memory.SharedMemory : **shm**: das Segment.
+    '''
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def _unlinkSharedMemory(shm):
+    '''
+    Entfernt ein mit `_openSharedMemory()` erzeugtes Segment.
+
+    Vor Python 3.13 meldet `unlink()` das Segment beim Resource-Tracker ab; es wird daher
+    vorher wieder angemeldet, damit der Tracker keinen Fehler ausgibt.
+
+    Args:
+        shm (shared_memory.SharedMemory): Das zu entfernende Segment
+    '''
+    if sys.version_info < (3, 13):
+        resource_tracker.register(shm._name, "shared_memory")
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def _closeSharedMemory(shm):
+    '''
+    Schließt ein Segment, sofern keine Arrays mehr darauf verweisen.
+
+    Args:
+        shm (shared_memory.SharedMemory): Das zu schließende Segment
+
+    Returns:
+        bool : **closed**: `False`, wenn noch Array-Sichten existieren und das Schließen später wiederholt werden muss.
+    '''
+    try:
+        shm.close()
+    except BufferError:
+        return False
+    return True
+
+def _detachSharedMemory(shm):
+    '''
+    Löst ein Segment vom `SharedMemory`-Objekt, auf das noch Array-Sichten verweisen.
+
+    Die Sichten halten das zugrunde liegende `mmap` selbst am Leben; es wird freigegeben, sobald die
+    letzte Sicht gelöscht wird. Ohne das Lösen würde `SharedMemory.__del__` beim Beenden des
+    Interpreters mit einem `BufferError` scheitern.
+
+    Args:
+        shm (shared_memory.SharedMemory): Das zu lösende Segment
+    '''
+    if _closeSharedMemory(shm):
+        return
+    shm._buf  = None
+    shm._mmap = None
+    if getattr(shm, "_fd", -1) >= 0:
+        os.close(shm._fd)
+        shm._fd = -1
+
+def _processAlive(pid):
+    '''
+    Prüft, ob ein Prozess mit der angegebenen PID noch läuft.
+
+    Args:
+        pid (int): Prozess-ID
+
+    Returns:
+        bool : **alive**: `True`, wenn der Prozess existiert.
+    '''
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ResultStore:
+    def __init__(self, prefix="zka", timeout=120.0, max_entries=16):
+        '''
+        Serverweiter Ergebnisspeicher für die Zweikanalanalyse.
+
+        Ergebnisse werden über einen Schlüssel aus dem Inhalt der Eingangsdateien und den
+        Analyseparametern identifiziert (siehe `makeKey()`). Der Speicher sorgt dafür, dass:
+
+        - gleichzeitige Anfragen mit identischem Schlüssel auf eine einzige Berechnung warten,
+        - große Arrays nur einmal in einem Shared-Memory-Segment abgelegt und allen Sessions
+          sowie anderen Worker-Prozessen schreibgeschützt zur Verfügung gestellt werden,
+        - höchstens `max_entries` Ergebnisse gehalten werden; die am längsten nicht genutzten
+          werden verdrängt und ihre Segmente entfernt.
+
+        Args:
+            prefix (str): Präfix der Shared-Memory-Segmentnamen
+            timeout (float): Maximale Wartezeit in Sekunden auf ein Segment, das ein anderer Prozess gerade befüllt
+            max_entries (int): Maximale Anzahl gehaltener Ergebnisse je Prozess
+        '''
+        self.prefix         = prefix
+        self.timeout        = timeout
+        self.max_entries    = max_entries
+        self._lock          = threading.Lock()
+        self._results       = OrderedDict()   # Schlüssel -> Future mit dem fertigen Ergebnis (LRU-Reihenfolge)
+        self._segments      = {}              # Schlüssel -> (SharedMemory, selbst erzeugt)
+        self._retired       = []              # verdrängte Segmente, auf die noch Arrays verweisen
+
+    def makeKey(contents, **params):
+        '''
+        Erzeugt einen Schlüssel aus dem Inhalt der Dateien und den Analyseparametern.
+
+        Es wird bewusst der bereits gelesene Inhalt und nicht der Dateipfad übergeben: Die Analyse muss
+        auf genau denselben Bytes laufen, sonst könnte ein zwischenzeitlich überschriebenes File unter
+        dem Schlüssel des alten Inhalts gespeichert werden.
+
+        Args:
+            contents (list): Inhalte der Eingangsdateien (bytes)
+            **params: Analyseparameter, die das Ergebnis beeinflussen (z.B. Downsampling-Faktor)
+
+        Returns:
+            str : **key**: SHA-256 Hexdigest über Dateiinhalte und Parameter.
+        '''
+        digest = hashlib.sha256()
+        for content in contents:
+            digest.update(len(content).to_bytes(8, "little"))
+            digest.update(content)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def getOrCompute(self, key, compute):
+        '''
+        Gibt das Ergebnis zum Schlüssel zurück und berechnet es höchstens einmal.
+
+        - Liegt das Ergebnis in diesem Prozess bereits vor oder wird es gerade berechnet, wird darauf gewartet.
+
+        - Hat ein anderer Worker-Prozess das Ergebnis bereits abgelegt, wird dessen Segment geöffnet.
+
+        - Andernfalls wird `compute()` aufgerufen und das Ergebnis in einem neuen Segment abgelegt.
+
+        Args:
+            key (str): Schlüssel aus `makeKey()`
+            compute (callable): Funktion ohne Argumente, die ein `ZweikanalResult` liefert
+
+        Returns:
+            ZweikanalResult : **Ergebnis**: mit schreibgeschützten Arrays im Shared Memory.
+        '''
+        with self._lock:
+            future = self._results.get(key)
+            owner  = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+            else:
+                self._results.move_to_end(key)
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._attach(key)
+            if result is None:
+                result = self._publish(key, compute())
+        except BaseException as err:
+            # Fehlgeschlagene Berechnungen nicht speichern, damit ein neuer Versuch möglich ist
+            with self._lock:
+                del self._results[key]
+            future.set_exception(err)
+            raise
+        future.set_result(result)
+        self._evict()
+        return result
+
+    def clear(self):
+        '''
+        Leert den Speicher und entfernt alle von diesem Prozess erzeugten Shared-Memory-Segmente.
+
+        Bereits ausgegebene Arrays bleiben gültig, bis sie nicht mehr referenziert werden.
+        '''
+        with self._lock:
+            segments = list(self._segments.values())
+            retired, self._retired = self._retired, []
+            self._results.clear()
+            self._segments.clear()
+        for shm, created in segments:
+            if created:
+                _unlinkSharedMemory(shm)
+            retired.append(shm)
+        for shm in retired:
+            _detachSharedMemory(shm)
+
+    def cleanupStale(self):
+        '''
+        Entfernt Segmente mit dem eigenen Präfix, deren erzeugender Prozess nicht mehr läuft.
+
+        Die Segmente sind nicht beim Resource-Tracker registriert (siehe `_openSharedMemory()`) und bleiben
+        nach einem Absturz oder `kill -9` sonst dauerhaft in `/dev/shm` liegen. Auf Systemen ohne
+        `/dev/shm` (z.B. macOS) findet keine Bereinigung statt.
+        '''
+        if not os.path.isdir("/dev/shm"):
+            return
+        for name in os.listdir("/dev/shm"):
+            if not name.startswith(self.prefix + "_"):
+                continue
+            try:
+                shm = _openSharedMemory(name)
+            except (FileNotFoundError, PermissionError, ValueError):
+                continue
+            pid = int.from_bytes(shm.buf[8:16], "little") if shm.size >= _PREFIX_BYTES else 0
+            if pid and not _processAlive(pid):
+                _unlinkSharedMemory(shm)
+            shm.close()
+
+    def _evict(self):
+        '''
+        Verdrängt die am längsten nicht genutzten fertigen Ergebnisse, bis höchstens `max_entries` übrig sind.
+
+        Selbst erzeugte Segmente werden entfernt. Segmente, auf die noch Arrays laufender Sessions
+        verweisen, werden erst geschlossen, wenn diese freigegeben sind.
+        '''
+        evicted = []
+        with self._lock:
+            for key in list(self._results):
+                if len(self._results) <= self.max_entries:
+                    break
+                if self._results[key].done():
+                    del self._results[key]
+                    evicted.append(self._segments.pop(key, None))
+            retired, self._retired = self._retired, []
+        for segment in evicted:
+            if segment is None:
+                continue
+            shm, created = segment
+            if created:
+                _unlinkSharedMemory(shm)
+            retired.append(shm)
+        retired = [shm for shm in retired if not _closeSharedMemory(shm)]
+        with self._lock:
+            self._retired.extend(retired)
+
+    def _segmentName(self, key):
+        # Höchstens 31 Zeichen inkl. führendem "/" (Grenze unter macOS)
+        return f"{self.prefix}_v{_LAYOUT_VERSION}_{key[:20]}"
+
+    def _publish(self, key, result):
+        '''
+        Legt die Arrays eines Ergebnisses in einem neuen Shared-Memory-Segment ab.
+
+        Aufbau des Segments: 8 Byte Headerlänge, 8 Byte PID des erzeugenden Prozesses, JSON-Header mit
+        Layout-Version, Offset, Form und Datentyp jedes Arrays sowie `ZweikanalResult.meta()`, danach die
+        ausgerichteten Arrays. Die Headerlänge wird zuletzt
+        geschrieben und dient anderen Prozessen als Fertig-Markierung.
+        '''
+        arrays  = {name: np.ascontiguousarray(arr) for name, arr in result.arrays().items()}
+        layout  = {}
+        offset  = 0
+        for name, arr in arrays.items():
+            layout[name] = [offset, list(arr.shape), arr.dtype.str]
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        header  = json.dumps({"version": _LAYOUT_VERSION, "arrays": layout, "meta": result.meta()}).encode()
+        start   = -(-(_PREFIX_BYTES + len(header)) // _ALIGN) * _ALIGN
+
+        try:
+            shm = _openSharedMemory(self._segmentName(key), create=True, size=max(start + offset, 1))
+        except FileExistsError:
+            # Ein anderer Prozess war schneller: dessen Ergebnis verwenden
+            shared = self._attach(key)
+            return result if shared is None else shared
+        shm.buf[8:16] = os.getpid().to_bytes(8, "little")
+        shm.buf[_PREFIX_BYTES:_PREFIX_BYTES + len(header)] = header
+        for name, arr in arrays.items():
+            target = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=start + layout[name][0])
+            target[...] = arr
+        shm.buf[:8] = len(header).to_bytes(8, "little")
+        with self._lock:
+            self._segments[key] = (shm, True)
+        return self._view(shm)
+
+    def _attach(self, key):
+        '''
+        Öffnet das Segment eines anderen Prozesses und wartet, bis es vollständig befüllt ist.
+
+        Returns:
+            ZweikanalResult : **Ergebnis** oder `None`, falls kein (fertiges) Segment existiert oder
+            dessen Header nicht erkannt wird; das Ergebnis wird dann lokal berechnet.
+        '''
+        retryUntil = time.monotonic() + _OPEN_RETRY
+        while True:
+            try:
+                shm = _openSharedMemory(self._segmentName(key))
+                break
+            except FileNotFoundError:
+                return None
+            except ValueError:
+                # Zwischen shm_open und ftruncate des erzeugenden Prozesses ist das Segment leer
+                # ("cannot mmap an empty file"); kurz warten, sonst lokal rechnen
+                if time.monotonic() > retryUntil:
+                    return None
+                time.sleep(0.01)
+        deadline = time.monotonic() + self.timeout
+        while int.from_bytes(shm.buf[:8], "little") == 0:
+            # Erzeugender Prozess abgestürzt, bevor das Segment fertig befüllt war
+            pid = int.from_bytes(shm.buf[8:16], "little")
+            if time.monotonic() > deadline or (pid and not _processAlive(pid)):
+                shm.close()
+                return None
+            time.sleep(0.05)
+        try:
+            result = self._view(shm)
+        except ValueError:
+            shm.close()
+            return None
+        with self._lock:
+            self._segments[key] = (shm, False)
+        return result
+
+    def _view(self, shm):
+        '''
+        Erzeugt schreibgeschützte Array-Sichten auf ein befülltes Segment.
+
+        Die Sichten werden über `np.frombuffer()` erzeugt, das den Puffer bis zur Freigabe aller Sichten
+        exportiert hält. Dadurch schlägt `shm.close()` fehl, solange noch Arrays darauf verweisen,
+        statt den Speicher unter laufenden Sessions freizugeben (siehe `_evict()`).
+
+        Raises:
+            ValueError: Wenn der Header eine andere Layout-Version oder unbekannte Felder enthält.
+        '''
+        length  = int.from_bytes(shm.buf[:8], "little")
+        header  = json.loads(bytes(shm.buf[_PREFIX_BYTES:_PREFIX_BYTES + length]))   # JSONDecodeError ist ein ValueError
+        if not isinstance(header, dict) or header.get("version") != _LAYOUT_VERSION:
+            raise ValueError("Unbekannte Layout-Version des Segments")
+        metaFields = set(ZweikanalResult.__slots__) - set(ZweikanalResult.ARRAYS) - {"plots"}
+        arrayNames = {name for name in header.get("arrays", {}) if not name.startswith(ZweikanalResult.PLOTS_PREFIX)}
+        unknown = (arrayNames - set(ZweikanalResult.ARRAYS)) | (set(header.get("meta", {})) - metaFields)
+        if unknown:
+            raise ValueError(f"Unbekannte Felder im Segment-Header: {', '.join(sorted(unknown))}")
+        start   = -(-(_PREFIX_BYTES + length) // _ALIGN) * _ALIGN
+        raw     = np.frombuffer(shm.buf, dtype=np.uint8)
+        arrays  = {}
+        for name, (offset, shape, dtype) in header["arrays"].items():
+            dtype       = np.dtype(dtype)
+            nbytes      = int(np.prod(shape)) * dtype.itemsize
+            arrays[name] = raw[start + offset:start + offset + nbytes].view(dtype).reshape(shape)
+        return ZweikanalResult(**header["meta"], **arrays)
+
+# Serverweite Instanzen: Module werden vom Bokeh-Server nur einmal je Prozess importiert,
+# während main.py für jede Session neu ausgeführt wird.
+store       = ResultStore()
+executor    = ThreadPoolExecutor(max_workers=2)
+store.cleanupStale()
+atexit.register(store.clear)
@@ -1,10 +1,244 @@
 import numpy as np
+from math import gcd
 import acoular as ac
-from scipy.signal import correlate
+from scipy.signal import correlate, resample_poly
+from scipy.fft import rfft, irfft, next_fast_len
+from scipy.stats import norm
 import soundfile as sf
+from traits.api import Callable
+from ZweikanalResultClass import ZweikanalResult
+
+def _overlapSaveCorrelation(blockPairs, max_lag, block_size):
+    '''
+    Akkumuliert Auto- und Kreuzkorrelation blockweise nach dem Overlap-Save-Verfahren.
+
+    Die Eingangssignale werden als Folge von Blockpaaren gelesen. Für jeden Block des zweiten
+    Signals wird der um `max_lag` Samples erweiterte Ausschnitt des ersten Signals mit einer FFT
+    der Länge `block_size + 2*max_lag` korreliert; nur der nicht zyklisch verfälschte Anteil
+    (`2*max_lag + 1` Werte) wird aufsummiert. Der Speicherbedarf ist damit O(`block_size` + `max_lag`),
+    unabhängig von der Signallänge.
+
+    Args:
+        blockPairs (iterable): Folge von Tupeln `(block1, block2)` aufeinanderfolgender Signalblöcke
+        max_lag (int): Größte betrachtete Verzögerung in Samples
+        block_size (int): Anzahl Samples je Korrelationsblock
+
+    Returns:
+        ndarray, ndarray, ndarray, ndarray : **lags**: Verzögerungen `-max_lag ... max_lag` in Samples.
+        **auto_corr1**, **auto_corr2**: Autokorrelationen der Kanäle. **cross_corr**: Kreuzkorrelation
+        (gleiche Konvention wie `scipy.signal.correlate(sig1, sig2, mode='full')`).
+    '''
+    nLags   = 2 * max_lag + 1
+    segLen  = block_size + 2 * max_lag
+    nfft    = next_fast_len(segLen, real=True)
+    auto_corr1 = np.zeros(nLags)
+    auto_corr2 = np.zeros(nLags)
+    cross_corr = np.zeros(nLags)
+
+    def accumulate(seg1, seg2):
+        # Block des aktuellen Abschnitts, der um max_lag Samples Vorlauf/Nachlauf erweitert ist
+        blk1 = seg1[max_lag:len(seg1) - max_lag]
+        blk2 = seg2[max_lag:len(seg2) - max_lag]
+        S1   = rfft(seg1, nfft)
+        S2   = rfft(seg2, nfft)
+        B1   = np.conj(rfft(blk1, nfft))
+        B2   = np.conj(rfft(blk2, nfft))
+        auto_corr1[:] += irfft(S1 * B1, nfft)[:nLags]
+        auto_corr2[:] += irfft(S2 * B2, nfft)[:nLags]
+        cross_corr[:] += irfft(S1 * B2, nfft)[:nLags]
+
+    # Vorlauf mit Nullen, damit auch der erste Block negative Lags abdeckt
+    buf1 = np.zeros(max_lag)
+    buf2 = np.zeros(max_lag)
+    for block1, block2 in blockPairs:
+        n    = min(len(block1), len(block2))
+        buf1 = np.concatenate([buf1, block1[:n]])
+        buf2 = np.concatenate([buf2, block2[:n]])
+        while len(buf1) >= segLen:
+            accumulate(buf1[:segLen], buf2[:segLen])
+            buf1 = buf1[block_size:]
+            buf2 = buf2[block_size:]
+        if len(block1) != len(block2):
+            break
+    # Restblöcke mit Nullen für die positiven Lags auffüllen
+    buf1 = np.concatenate([buf1, np.zeros(max_lag)])
+    buf2 = np.concatenate([buf2, np.zeros(max_lag)])
+    while len(buf1) > 2 * max_lag:
+        accumulate(buf1[:segLen], buf2[:segLen])
+        buf1 = buf1[block_size:]
+        buf2 = buf2[block_size:]
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    return lags, auto_corr1, auto_corr2, cross_corr
+
+def _pairBlocks(blocks1, blocks2, block_size):
+    '''
+    Fasst zwei Folgen von Signalblöcken beliebiger Länge zu gleich langen Blockpaaren zusammen.
+
+    Endet eine der Folgen früher, wird auf die kürzere Signallänge begrenzt.
+
+    Args:
+        blocks1 (iterable): Blöcke des ersten Signals
+        blocks2 (iterable): Blöcke des zweiten Signals
+        block_size (int): Länge der ausgegebenen Blöcke
+
+    Returns:
+        generator : **blockPairs**: Tupel `(block1, block2)` mit je `block_size` Samples (der letzte ggf. kürzer).
+    '''
+    buf1, buf2 = np.zeros(0), np.zeros(0)
+    iter1, iter2 = iter(blocks1), iter(blocks2)
+    done1 = done2 = False
+    while True:
+        while not done1 and len(buf1) < block_size:
+            block = next(iter1, None)
+            done1 = block is None
+            if not done1:
+                buf1 = np.concatenate([buf1, block])
+        while not done2 and len(buf2) < block_size:
+            block = next(iter2, None)
+            done2 = block is None
+            if not done2:
+                buf2 = np.concatenate([buf2, block])
+        n = min(len(buf1), len(buf2), block_size)
+        if n == 0:
+            return
+        yield buf1[:n], buf2[:n]
+        if n < block_size:
+            return
+        buf1, buf2 = buf1[n:], buf2[n:]
+
+def _resampleBlocks(blocks, up, down):
+    '''
+    Tastet eine Folge von Signalblöcken polyphasig um den Faktor `up/down` um.
+
+    Jeder Abschnitt wird mit `scipy.signal.resample_poly()` inklusive eines Kontexts von mindestens
+    der halben Filterlänge an beiden Rändern umgetastet; ausgegeben wird nur der vom Rand unbeeinflusste
+    Teil. Das Ergebnis stimmt daher mit der Umtastung des gesamten Signals überein, der Speicherbedarf
+    hängt aber nur von der Blocklänge ab.
+
+    Args:
+        blocks (iterable): Aufeinanderfolgende Signalblöcke
+        up (int): Hochtastfaktor
+        down (int): Heruntertastfaktor
+
+    Returns:
+        generator : **blocks**: die umgetasteten Signalblöcke.
+    '''
+    # Filterhalblänge von resample_poly im hochgetasteten Bereich, als Kontext in Eingangssamples
+    # (Vielfaches von down, damit die Ausgabeindizes ganzzahlig bleiben)
+    halfLen = 10 * max(up, down)
+    pad     = down * (-(-halfLen // (up * down)) + 1)
+    buf     = np.zeros(pad)
+    for block in blocks:
+        buf  = np.concatenate([buf, block])
+        core = (len(buf) - 2 * pad) // down * down
+        if core > 0:
+            out = resample_poly(buf[:core + 2 * pad], up, down)
+            yield out[pad * up // down:(pad + core) * up // down]
+            buf = buf[core:]
+    # Restblock mit Nullen auffüllen (wie resample_poly am Signalende)
+    rest = len(buf) - pad
+    if rest > 0:
+        out = resample_poly(np.concatenate([buf, np.zeros(pad)]), up, down)
+        yield out[pad * up // down:pad * up // down + -(-rest * up // down)]
+
+def _skipBlocks(blocks, skip):
+    '''
+    Verwirft die ersten `skip` Samples einer Folge von Signalblöcken.
+
+    Args:
+        blocks (iterable): Aufeinanderfolgende Signalblöcke
+        skip (int): Anzahl der zu verwerfenden Samples
+
+    Returns:
+        generator : **blocks**: die verbleibenden Signalblöcke.
+    '''
+    for block in blocks:
+        if skip >= len(block):
+            skip -= len(block)
+            continue
+        yield block[skip:]
+        skip = 0
+
+def _wavBlocks(path, fs, skip=0, downsampling_factor=1, read_size=65536):
+    '''
+    Liest eine WAV-Datei blockweise und tastet sie dabei auf eine gemeinsame Abtastfrequenz um.
+
+    Die Datei wird zunächst (wie in `loadSignalWAV()`) auf `fs` umgetastet, dann werden `skip` Samples
+    verworfen (Laufzeitkompensation) und das Signal abschließend um `downsampling_factor` unterabgetastet.
+    Jeder Aufruf liest die Datei von vorn; Dateiobjekte werden dazu zurückgesetzt.
+
+    Args:
+        path (string): Pfad der WAV-Datei (oder Dateiobjekt, siehe `soundfile.blocks()`)
+        fs (int): Gemeinsame Abtastfrequenz in Hz, auf die umgetastet wird
+        skip (int): Anzahl der zu verwerfenden Samples bei der Abtastfrequenz `fs`
+        downsampling_factor (int): Unterabtastfaktor nach der Laufzeitkompensation
+        read_size (int): Anzahl Samples je gelesenem Block
+
+    Returns:
+        generator : **blocks**: die umgetasteten Signalblöcke.
+    '''
+    if hasattr(path, 'seek'):
+        path.seek(0)
+    fsFile = sf.info(path).samplerate
+    if hasattr(path, 'seek'):
+        path.seek(0)
+    blocks = sf.blocks(path, blocksize=read_size)
+    if fsFile != fs:
+        g       = gcd(fsFile, fs)
+        blocks  = _resampleBlocks(blocks, fs // g, fsFile // g)
+    if skip > 0:
+        blocks  = _skipBlocks(blocks, skip)
+    if downsampling_factor != 1:
+        blocks  = _resampleBlocks(blocks, 1, downsampling_factor)
+    return blocks
+
+class _BlockPairSamples(ac.SamplesGenerator):
+    '''
+    Acoular-Quelle für zwei Kanäle, die blockweise aus einer Folge von Blockpaaren gelesen werden.
+
+    Im Gegensatz zu `acoular.TimeSamples` liegen die Signale nicht im Speicher; es wird nur so weit gelesen,
+    wie nachfolgende Generatoren Blöcke anfordern (siehe `ZweikanalAnalyse.streamWAV()`).
+    '''
+    #: Funktion `blockPairs(block_size)`, die bei jedem Aufruf eine neue Folge von Blockpaaren liefert
+    blockPairs = Callable()
+
+    def result(self, num=128):
+        for block1, block2 in self.blockPairs(num):
+            yield np.stack([block1, block2], axis=1)
+
+def _randomErrors(psd1, psd2, csd, nAverages):
+    '''
+    Berechnet die normierten Zufallsfehler von :math:`|H(f)|`, Phase und Kohärenz (nach Bendat & Piersol).
+
+    .. math::
+
+        \\varepsilon\\left[|H|\\right] = \\sigma\\left[\\varphi\\right] = \\frac{\\sqrt{1-\\gamma^2}}{|\\gamma| \\sqrt{2 n_d}}
+        \\qquad
+        \\varepsilon\\left[\\gamma^2\\right] = \\frac{\\sqrt{2}\\,(1-\\gamma^2)}{|\\gamma| \\sqrt{n_d}}
+
+    Dabei ist :math:`n_d` die effektive Anzahl gemittelter Blöcke. Die Phase :math:`\\sigma[\\varphi]`
+    ist eine absolute Standardabweichung in rad, die beiden anderen Fehler sind relativ.
+
+    Args:
+        psd1 (array): Autoleistungsspektrum des ersten Signals
+        psd2 (array): Autoleistungsspektrum des zweiten Signals
+        csd (array): Kreuzleistungsspektrum zwischen den beiden Signalen
+        nAverages (int): Effektive Anzahl gemittelter Blöcke
+
+    Returns:
+        ndarray, ndarray, ndarray, ndarray : **coherence**, **epsH** (relativer Fehler von :math:`|H|`),
+        **sigmaPhase** (Standardabweichung der Phase in rad), **epsCoherence** (relativer Fehler von :math:`\\gamma^2`).
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coherence       = np.clip(np.abs(csd)**2 / np.real(psd1 * psd2), 0, 1)
+        gamma           = np.sqrt(coherence)
+        epsH            = np.sqrt(1 - coherence) / (gamma * np.sqrt(2 * nAverages))
+        epsCoherence    = np.sqrt(2) * (1 - coherence) / (gamma * np.sqrt(nAverages))
+    return coherence, epsH, epsH, epsCoherence
 
 class ZweikanalAnalyse:
-    def __init__(self, signal1, signal2, fs):
+    def __init__(self, signal1, signal2, fs, delay=0.0):
         '''
         Instanziert ein Objekt der Signalanalyse-Klasse `Zweikanalanalyse`
         mit den folgenden Parametern.
@@ -13,10 +247,13 @@ class ZweikanalAnalyse:
             signal1 (array): Der zeitdiskrete Signal 1 vom Kanal 1
             signal2 (array): Der zeitdiskrete Signal 2 vom Kanal 2
             fs (int): Abtastrate der Signale in Hz
+            delay (float): Bereits kompensierte Laufzeit von Signal 2 gegenüber Signal 1 in Sekunden (siehe `loadSignalWAV()`).
+                Die Zeitachsen von Korrelationen und Impulsantwort werden um diese Laufzeit korrigiert.
         '''
         self.signal1    = signal1
         self.signal2    = signal2
         self.fs         = fs
+        self.delay      = delay
         self.duration   = len(signal1) / fs
         self.tsAcoular  = self.build_tsAcoularObject()
         self.auto_corr1 = None
@@ -29,8 +266,12 @@ class ZweikanalAnalyse:
         self.H          = None
         self.impulse_response   = None
         self.block_size = None
+        self.nAverages  = None
         self.correlationLags    = None
         self.coherence  = None
+        self.H_abs_bounds       = None
+        self.H_phase_bounds     = None
+        self.coherence_bounds   = None
         self.time_axis  = None
         self.lags_sec   = None
 
@@ -57,28 +298,126 @@ class ZweikanalAnalyse:
         sf.write("signal1.wav", signal1, fs)
         sf.write("signal2.wav", signal2, fs)
 
-    def loadSignalWAV(signal1Path, signal2Path):
+    def loadSignalWAV(signal1Path, signal2Path, compensate_delay=True, max_delay=None, min_peak_ratio=8.0):
         '''
         Lädt die aufbereitete Signale und speichert sie zusammen mit deren Abtastfrequenz in einem Objekt der Klasse Acoular.
 
-        Die Funktion überprüft, dass die Signallängen überreinstimmen gibt neben das Acoular-Objekt auch die Abtastfrequenz vereinzelt zurück.
+        - Unterscheiden sich die Abtastfrequenzen, wird das Signal mit der höheren Abtastfrequenz über einen
+          rationalen Polyphasen-Filter (`scipy.signal.resample_poly()`) auf die niedrigere Abtastfrequenz umgetastet.
+
+        - Optional wird die Laufzeit (Bulk-Delay) zwischen den Kanälen mit `estimateDelay()` geschätzt und durch
+          Verschieben der Signale kompensiert. Ohne diese Kompensation werden :math:`H(f)` und die Kohärenz bei
+          kleinen Blockgrößen verfälscht. Die geschätzte Laufzeit wird zurückgegeben, damit sie als `delay` an
+          `ZweikanalAnalyse` übergeben und in den Zeitachsen berücksichtigt werden kann. Ist die Laufzeit nicht
+          signifikant (siehe `min_peak_ratio`), bleiben die Signale unverändert.
+
+        - Anschließend werden beide Signale auf die gemeinsame Länge gekürzt.
 
         Args:
-            signal1Path (string)   :  Pfad Eingagnssignale
-            signal2Path (string)   :  Pfad Ausgangssignale
+            signal1Path (string)   :  Pfad Eingagnssignale (oder Dateiobjekt, siehe `soundfile.read()`)
+            signal2Path (string)   :  Pfad Ausgangssignale (oder Dateiobjekt, siehe `soundfile.read()`)
+            compensate_delay (bool):  Laufzeit zwischen den Kanälen schätzen und kompensieren
+            max_delay (int)        :  Größte gesuchte Laufzeit in Samples (Standard: 5 % der Signallänge, siehe `estimateDelay()`)
+            min_peak_ratio (float) :  Mindestverhältnis von Spitzen- zu Effektivwert der Kreuzkorrelation für eine Kompensation
 
         Returns:
-            ac.TimeSamples, int : **Acoular-Objekt**: mit beiden Signalen im Zeitbereich und deren Abtastfrequenz. **fsS1**: die Abtastfrequenz der Signale (separat).
+            ac.TimeSamples, int, int : **Acoular-Objekt**: mit beiden Signalen im Zeitbereich und deren Abtastfrequenz. **fs**: die gemeinsame Abtastfrequenz der Signale (separat).
+            **delay**: die kompensierte Laufzeit von Signal 2 gegenüber Signal 1 in Samples (0 ohne Kompensation).
     
         '''
         # lädt Inhalt der Signale und Abtastrate
         dataS1, fsS1 = sf.read(signal1Path)
         dataS2, fsS2 = sf.read(signal2Path)
 
-        assert fsS1 == fsS2 # Überprüft ob Abtastraten gleich sind 
+        # Abtastraten angleichen (rationaler Faktor up/down)
+        fs = min(fsS1, fsS2)
+        if fsS1 != fs:
+            g       = gcd(fsS1, fs)
+            dataS1  = resample_poly(dataS1, fs // g, fsS1 // g)
+        if fsS2 != fs:
+            g       = gcd(fsS2, fs)
+            dataS2  = resample_poly(dataS2, fs // g, fsS2 // g)
+
+        # Laufzeit kompensieren: positiver Delay bedeutet, dass Signal 2 später ankommt
+        delay = 0
+        if compensate_delay:
+            delay = ZweikanalAnalyse.estimateDelay(dataS1, dataS2, max_delay=max_delay, min_peak_ratio=min_peak_ratio)
+            if delay > 0:
+                dataS2 = dataS2[delay:]
+            elif delay < 0:
+                dataS1 = dataS1[-delay:]
+
         min_len = min(len(dataS1), len(dataS2))
         data    = np.stack([dataS1[:min_len], dataS2[:min_len]], axis=1)
-        return ac.TimeSamples(data=data, sample_freq=fsS1), fsS1
+        return ac.TimeSamples(data=data, sample_freq=fs), fs, delay
+
+    def estimateDelay(signal1, signal2, max_delay=None, decimation=8, block_size=65536, min_peak_ratio=8.0, candidates=3):
+        '''
+        Schätzt die Laufzeit (Bulk-Delay) von Signal 2 gegenüber Signal 1 in Samples.
+
+        Die Suche erfolgt zweistufig:
+
+        - Grob: Beide Signale werden um den Faktor `decimation` polyphasig unterabgetastet und im Bereich
+          `-max_delay ... max_delay` kreuzkorreliert.
+
+        - Fein: Um die `candidates` höchsten Spitzen der Grobsuche werden die Signale gegeneinander verschoben und
+          mit voller Abtastrate im Bereich von jeweils `±2*decimation` Samples blockweise korreliert (siehe
+          `computeCorrelationsBlockwise()`). Die Unterabtastung entfernt bei breitbandigen Signalen einen Großteil
+          der Energie, sodass die höchste Grobspitze auf einer Nebenspitze liegen kann; maßgeblich ist daher die
+          höchste Spitze der Feinsuche.
+
+        Ist die höchste Spitze der Grob-Kreuzkorrelation nicht mindestens `min_peak_ratio`-mal so hoch wie deren
+        Effektivwert im Suchbereich (z.B. bei unabhängigen Signalen oder periodischen Signalen ohne eindeutige
+        Laufzeit), wird keine Laufzeit geschätzt und 0 zurückgegeben.
+
+        Args:
+            signal1 (array): Der zeitdiskrete Signal 1 vom Kanal 1
+            signal2 (array): Der zeitdiskrete Signal 2 vom Kanal 2
+            max_delay (int): Größte gesuchte Laufzeit in Samples (Standard: 5 % der Signallänge)
+            decimation (int): Unterabtastfaktor für die Grobsuche
+            block_size (int): Anzahl Samples je Korrelationsblock der Feinsuche
+            min_peak_ratio (float): Mindestverhältnis von Spitzenwert zu Effektivwert der Kreuzkorrelation
+            candidates (int): Anzahl der Grobspitzen, um die fein gesucht wird
+
+        Returns:
+            int : **delay**: Laufzeit in Samples. Positiv, wenn Signal 2 gegenüber Signal 1 verzögert ist;
+            0, wenn keine signifikante Laufzeit gefunden wurde.
+        '''
+        n = min(len(signal1), len(signal2))
+        if max_delay is None:
+            max_delay = n // 20
+        max_delay = min(max_delay, n - 1)
+
+        # Grobsuche auf unterabgetasteten Signalen
+        coarse1 = resample_poly(signal1[:n], 1, decimation)
+        coarse2 = resample_poly(signal2[:n], 1, decimation)
+        cc      = correlate(coarse1, coarse2, mode='full', method='fft')
+        lags    = np.arange(-len(coarse2) + 1, len(coarse1))
+        valid   = np.abs(lags) <= max_delay // decimation
+        ccAbs   = np.abs(cc[valid])
+        lags    = lags[valid]
+        if len(ccAbs) == 0 or ccAbs.max() < min_peak_ratio * np.sqrt(np.mean(ccAbs**2)):
+            return 0
+
+        # Lokale Maxima der Grobsuche, absteigend nach Höhe
+        isPeak  = np.r_[True, ccAbs[1:] >= ccAbs[:-1]] & np.r_[ccAbs[:-1] >= ccAbs[1:], True]
+        peaks   = np.flatnonzero(isPeak)
+        peaks   = peaks[np.argsort(ccAbs[peaks])[::-1][:candidates]]
+
+        # Feinsuche um jede Grobspitze mit voller Abtastrate
+        window  = 2 * decimation
+        best, bestValue = 0, -1.0
+        for coarse in -lags[peaks] * decimation:
+            if coarse >= 0:
+                sig1, sig2 = signal1[:n - coarse], signal2[coarse:n]
+            else:
+                sig1, sig2 = signal1[-coarse:n], signal2[:n + coarse]
+            blockPairs = ((sig1[i:i + block_size], sig2[i:i + block_size]) for i in range(0, len(sig1), block_size))
+            fineLags, _, _, ccFine = _overlapSaveCorrelation(blockPairs, window, block_size)
+            k = np.argmax(np.abs(ccFine))
+            if np.abs(ccFine[k]) > bestValue:
+                best, bestValue = int(coarse - fineLags[k]), np.abs(ccFine[k])
+        return best
 
     def build_tsAcoularObject(self):
         '''
@@ -139,6 +478,103 @@ class ZweikanalAnalyse:
         self.set_cross_correlation( cross_corr)
         self.set_correlation_lags(lags)
 
+    def computeCorrelationsBlockwise(self, max_lag, block_size=4096):
+        '''
+        Berechnet die Auto- und Kreuzkorrelation blockweise (Overlap-Save) für einen begrenzten Lag-Bereich.
+
+        Im Gegensatz zu `computeCorrelations()` werden nur die Verzögerungen `-max_lag ... max_lag`
+        berechnet. Die Signale werden in Blöcken der Länge `block_size` verarbeitet, sodass die
+        temporären FFT-Arrays nicht mit der Signallänge wachsen.
+
+        Args:
+            max_lag (int): Größte betrachtete Verzögerung in Samples
+            block_size (int): Anzahl Samples je Korrelationsblock
+
+        Note:
+            Die Ergebnisse werden wie bei `computeCorrelations()` mit den `set_correlation_lags()`,
+            `set_autocorrelations()` und `set_cross_correlation()` Methoden gespeichert.
+        '''
+        blockPairs = ((self.signal1[i:i + block_size], self.signal2[i:i + block_size])
+                      for i in range(0, len(self.signal1), block_size))
+        lags, auto_corr1, auto_corr2, cross_corr = _overlapSaveCorrelation(blockPairs, max_lag, block_size)
+
+        # Werte speichern
+        self.set_autocorrelations( auto_corr1, auto_corr2)
+        self.set_cross_correlation( cross_corr)
+        self.set_correlation_lags(lags)
+
+    def correlateWAVBlockwise(signal1Path, signal2Path, max_lag, block_size=65536):
+        '''
+        Berechnet die Auto- und Kreuzkorrelation zweier WAV-Dateien blockweise, ohne sie vollständig zu laden.
+
+        Die Dateien werden abschnittsweise mit `soundfile.blocks()` gelesen und über das Overlap-Save-Verfahren
+        korreliert. Der Speicherbedarf ist O(`block_size` + `max_lag`), sodass auch mehrstündige Aufnahmen
+        verarbeitet werden können. Wie in `loadSignalWAV()` wird die Datei mit der höheren Abtastfrequenz
+        polyphasig auf die niedrigere umgetastet (hier blockweise) und auf die kürzere Signallänge begrenzt.
+
+        Args:
+            signal1Path (string)   :  Pfad Eingangssignal
+            signal2Path (string)   :  Pfad Ausgangssignal
+            max_lag (int)          :  Größte betrachtete Verzögerung in Samples
+            block_size (int)       :  Anzahl Samples je gelesenem Block
+
+        Returns:
+            ndarray, ndarray, ndarray, ndarray, int : **lags**, **auto_corr1**, **auto_corr2**, **cross_corr** (siehe `computeCorrelations()`)
+            sowie **fs**: die gemeinsame Abtastfrequenz der Signale.
+        '''
+        # Abtastraten blockweise angleichen (rationaler Faktor up/down)
+        fs      = min(sf.info(signal1Path).samplerate, sf.info(signal2Path).samplerate)
+        blocks1 = _wavBlocks(signal1Path, fs, read_size=block_size)
+        blocks2 = _wavBlocks(signal2Path, fs, read_size=block_size)
+
+        blockPairs = _pairBlocks(blocks1, blocks2, block_size)
+        lags, auto_corr1, auto_corr2, cross_corr = _overlapSaveCorrelation(blockPairs, max_lag, block_size)
+        return lags, auto_corr1, auto_corr2, cross_corr, fs
+
+    def streamWAV(signal1Path, signal2Path, delay=0, downsampling_factor=1, read_size=65536):
+        '''
+        Erzeugt eine Acoular-Quelle, die zwei WAV-Dateien blockweise liest, statt sie vollständig zu laden.
+
+        Die Signale werden wie in `loadSignalWAV()` auf die niedrigere Abtastfrequenz umgetastet und um die Laufzeit
+        `delay` gegeneinander verschoben, anschließend um `downsampling_factor` (polyphasig) unterabgetastet.
+        Die Quelle kann mit `computePSD_CSD(source=...)` verwendet werden: Im adaptiven Modus wird das Lesen
+        beendet, sobald der Zielfehler erreicht ist.
+
+        Args:
+            signal1Path (string)      :  Pfad Eingangssignal (oder Dateiobjekt, siehe `soundfile.blocks()`)
+            signal2Path (string)      :  Pfad Ausgangssignal (oder Dateiobjekt, siehe `soundfile.blocks()`)
+            delay (int)               :  Zu kompensierende Laufzeit von Signal 2 gegenüber Signal 1 in Samples bei der
+                                         gemeinsamen Abtastfrequenz (z.B. aus `estimateDelay()` oder `loadSignalWAV()`)
+            downsampling_factor (int) :  Unterabtastfaktor
+            read_size (int)           :  Anzahl Samples je gelesenem Block
+
+        Returns:
+            ac.SamplesGenerator : **Acoular-Objekt**: Quelle mit beiden Signalen und der (unterabgetasteten) Abtastfrequenz.
+        '''
+        info1   = sf.info(signal1Path)
+        info2   = sf.info(signal2Path)
+        fs      = min(info1.samplerate, info2.samplerate)
+        skip1   = max(-delay, 0)
+        skip2   = max(delay, 0)
+
+        def numSamples(info, skip):
+            # Länge nach Umtastung (wie resample_poly), Laufzeitkompensation und Unterabtastung
+            g = gcd(info.samplerate, fs)
+            n = -(-info.frames * (fs // g) // (info.samplerate // g)) - skip
+            return -(-max(n, 0) // downsampling_factor)
+
+        def blockPairs(block_size):
+            blocks1 = _wavBlocks(signal1Path, fs, skip1, downsampling_factor, read_size)
+            blocks2 = _wavBlocks(signal2Path, fs, skip2, downsampling_factor, read_size)
+            return _pairBlocks(blocks1, blocks2, block_size)
+
+        return _BlockPairSamples(
+            blockPairs=blockPairs,
+            sample_freq=fs / downsampling_factor,
+            num_channels=2,
+            num_samples=min(numSamples(info1, skip1), numSamples(info2, skip2)),
+        )
+
     def set_correlation_lags(self, lags):
         '''
         Speichert die Lags der Korrelationen. Diese dienen der Erstellung einer Zeitachse zur Visualisierung der Auto- und Kreuzkorrelationfunktionen.
@@ -150,8 +586,11 @@ class ZweikanalAnalyse:
             Die Methode speichert die Zeitverzögerungen (`lags`) zwischen den Signalen in:
 
             - `self.correlationLags` (ndarray): Objektattribut zu den Korrelations-Lags
+            - `self.lags_sec` (ndarray): Objektattribut zu den Lags in Sekunden. Die Kreuzkorrelation der unkompensierten
+              Signale liegt auf der Achse `self.lags_sec - self.delay`.
         '''
         self.correlationLags = lags
+        self.lags_sec        = lags / self.fs
         
     def set_autocorrelations(self, ac1, ac2):
         '''
@@ -198,7 +637,7 @@ class ZweikanalAnalyse:
         '''
         setattr(self, fieldName, fieldValue)
         
-    def computePSD_CSD(self,block_size=512):
+    def computePSD_CSD(self,block_size=512, target_error=None, band=None, confidence=0.95, min_averages=16, min_coherence=0.1, source=None):
         '''
         Transformiert die zeitdiskreten Signale in den Frequenzbereich und berechnet die Auto- und Kreuzleistungsspektren.
 
@@ -218,11 +657,31 @@ class ZweikanalAnalyse:
 
         - Extrahiert die Auto- und Kreuzleistungsspektren.
 
+        Ist `target_error` gesetzt, arbeitet die Methode adaptiv: Die Blöcke werden einzeln transformiert und laufend gemittelt.
+        Sobald im Frequenzband `band` die halbe Breite des Konfidenzintervalls von :math:`|H(f)|` (relativ, siehe
+        `computeConfidenceBounds()`) überall kleiner als `target_error` ist, wird die Mittelung beendet. Frequenzen mit einer
+        Kohärenz unter `min_coherence` gehen nicht in das Kriterium ein, da ihr Fehler mit weiteren Blöcken kaum sinkt.
+        Mit `self.tsAcoular` als Quelle werden nur FFT und Mittelung der restlichen Blöcke eingespart, da die Signale bereits
+        vollständig im Speicher liegen. Mit einer blockweise lesenden Quelle (`source`, siehe `streamWAV()`) wird
+        auch das Lesen der restlichen Blöcke beendet.
+
+        Args:
+            block_size (int): Größe der FFT-Blöcke
+            target_error (float): Ziel für den relativen Fehler von :math:`|H(f)|` im adaptiven Modus (Standard: alle Blöcke mitteln)
+            band (tuple): Frequenzband `(fmin, fmax)` in Hz, in dem `target_error` erreicht werden muss (Standard: alle Frequenzen)
+            confidence (float): Konfidenzniveau für das Abbruchkriterium
+            min_averages (int): Mindestanzahl gemittelter Blöcke, bevor abgebrochen werden darf
+            min_coherence (float): Frequenzen mit geringerer Kohärenz werden im adaptiven Abbruchkriterium nicht berücksichtigt
+            source (ac.SamplesGenerator): Quelle der beiden Signale mit derselben Abtastfrequenz wie das Objekt (Standard: `self.tsAcoular`)
+
+        Raises:
+            ValueError: Wenn die Signale kürzer als ein Block sind oder die Abtastfrequenz der Quelle abweicht.
+
         Note:
 
             Erforderlich für die Berechnung:
 
-            - `self.tsAcoular` (acoular.TimeSamples) : Enthält Daten der beiden zeitdiskreten Signale und deren Abtastfrequenz
+            - `self.tsAcoular` (acoular.TimeSamples) : Enthält Daten der beiden zeitdiskreten Signale und deren Abtastfrequenz (sofern `source` nicht gesetzt ist)
             
             Die Methode berechnet:
 
@@ -232,25 +691,61 @@ class ZweikanalAnalyse:
 
             Die Ergebnisse werden mit der `set_psd_csd()` Methode überarbeitet und gespeichert. (Siehe die jeweilige Dokumentation)
         '''
+        if source is None:
+            source = self.tsAcoular
+        if source.sample_freq != self.fs:
+            raise ValueError(f"Abtastfrequenz der Quelle ({source.sample_freq} Hz) weicht von der des Objekts ({self.fs} Hz) ab")
         # Anzahl Blöcke über die Ergebnisse gemittelt werden
-        nBlocks     = int(self.tsAcoular.numsamples/block_size)
+        nBlocks     = int(source.numsamples/block_size)
+        if nBlocks == 0:
+            raise ValueError(f"Die Signale ({source.numsamples} Samples) sind kürzer als ein Block ({block_size} Samples)")
         # FFT
-        fft         = ac.RFFT(source=self.tsAcoular, block_size=block_size)
+        fft         = ac.RFFT(source=source, block_size=block_size)
         fft.scaling = 'none'
         # Bilde Auto-/Kreuzleistungsspektrum  
         cps         = ac.CrossPowerSpectra(source=fft)
-        # Mittelwert für jeden Block
-        avg         = ac.Average(source=cps, naverage=nBlocks)
-        csmFlat     = next(avg.result(num=1))
+        if target_error is None:
+            # Mittelwert für jeden Block
+            avg         = ac.Average(source=cps, naverage=nBlocks)
+            csmFlat     = next(avg.result(num=1))
+        else:
+            csmFlat, nBlocks = self._averageAdaptive(cps, fft, target_error, band, confidence, min_averages, min_coherence)
         # Dimension anpassen so dass cms PSD und CPSD gesondert in einem array
-        csmMatrix   = csmFlat.reshape(fft.numfreqs, self.tsAcoular.num_channels, self.tsAcoular.num_channels)
+        csmMatrix   = csmFlat.reshape(fft.numfreqs, source.num_channels, source.num_channels)
         psd1        = csmMatrix[:,0,0]
         psd2        = csmMatrix[:,1,1]
         csd         = csmMatrix [:,0,1]
         # Werte speichern
-        self.set_psd_csd( fft.freqs, psd1, psd2, csd,block_size)
+        self.set_psd_csd( fft.freqs, psd1, psd2, csd,block_size, nBlocks)
+
+    def _averageAdaptive(self, cps, fft, target_error, band, confidence, min_averages, min_coherence):
+        '''
+        Mittelt die Kreuzleistungsmatrizen blockweise, bis der Zielfehler im Frequenzband erreicht ist.
+
+        Abgebrochen wird nur, wenn mindestens eine Frequenz im Band die Kohärenzschwelle erreicht; sonst
+        werden alle Blöcke gemittelt.
+
+        Returns:
+            ndarray, int : **csmFlat**: gemittelte Kreuzleistungsmatrix (wie von `acoular.Average`). **nBlocks**: Anzahl gemittelter Blöcke.
+        '''
+        z       = norm.ppf(0.5 + confidence / 2)
+        inBand  = np.ones(fft.numfreqs, dtype=bool) if band is None else (fft.freqs >= band[0]) & (fft.freqs <= band[1])
+        nc      = fft.num_channels
+        csmSum  = 0
+        nBlocks = 0
+        for block in cps.result(num=1):
+            csmSum  = csmSum + block
+            nBlocks += 1
+            if nBlocks < min_averages:
+                continue
+            csmMatrix = (csmSum / nBlocks).reshape(fft.numfreqs, nc, nc)
+            coherence, epsH, _, _ = _randomErrors(csmMatrix[:,0,0], csmMatrix[:,1,1], csmMatrix[:,0,1], nBlocks)
+            valid = inBand & (coherence >= min_coherence)
+            if valid.any() and np.all(z * epsH[valid] <= target_error):
+                break
+        return csmSum / nBlocks, nBlocks
         
-    def set_psd_csd(self, freqs, psd1, psd2, csd,block_size):
+    def set_psd_csd(self, freqs, psd1, psd2, csd,block_size, nAverages=None):
         '''
         Speichert die berechneten Autoeistungsspektren und das berechnete Kreuzleistungsspektrum von beiden Signalen.
 
@@ -262,6 +757,7 @@ class ZweikanalAnalyse:
             psd2 (array): Leistungsspektrum des zweiten Signals
             csd (array): Kreuzleistungsspektrum zwischen den beiden Signalen
             block_size (int): Größe der FFT-Blöcke
+            nAverages (int): Anzahl der gemittelten Blöcke
         
         Note:
             Die Methode speichert die berecheten Größen in:
@@ -270,8 +766,11 @@ class ZweikanalAnalyse:
             - `self.psd2` (ndarray): Objektattribut zum berechneten  Autoleistungsspektrum vom Signal 2
             - `self.csd` (ndarray): Objektattribut zum berechneten  Kreuzleistungsspektrum der Signale
             - `self.freqs` (ndarray): Objektattribut zur erzeugten Frequenzachse für die Visualisierung der Auto- und Kreuzleistungsspektren.
+            - `self.block_size` (int): Objektattribut zur verwendeten Blockgröße.
+            - `self.nAverages` (int): Objektattribut zur Anzahl der gemittelten Blöcke.
         '''
-        # self.windowSize = block_size
+        self.block_size = block_size
+        self.nAverages  = nAverages
         self.freqs      = freqs
         self.psd1       = psd1
         self.psd2       = psd2
@@ -362,9 +861,10 @@ class ZweikanalAnalyse:
 
             Die Methode speichert die erzeugte Zeitachse für die spätere Visualisierung:
 
-            - `self.time_axis` (ndarray): Objektattribut zur erzeugten Zeitachse für die Visualisierung der berechneten Impulsantwort.
+            - `self.time_axis` (ndarray): Objektattribut zur erzeugten Zeitachse für die Visualisierung der berechneten Impulsantwort,
+              verschoben um die kompensierte Laufzeit `self.delay`.
         '''
-        self.time_axis          = np.arange(len(h)) / self.fs
+        self.time_axis          = np.arange(len(h)) / self.fs + self.delay
         self.impulse_response   = h
             
     def computeCoherence(self):
@@ -408,4 +908,111 @@ class ZweikanalAnalyse:
             - `self.coherence` (ndarray): Objektattribut zur berechneten Kohärenz.
 
         '''
-        self.coherence = coherence
\ No newline at end of file
+        self.coherence = coherence
+
+    def computeConfidenceBounds(self, confidence=0.95):
+        '''
+        Berechnet Konfidenzgrenzen für :math:`|H(f)|`, die Phase von :math:`H(f)` und die Kohärenz.
+
+        Die Zufallsfehler folgen aus der effektiven Anzahl gemittelter Blöcke :math:`n_d` und der Kohärenz
+        (siehe `_randomErrors()`). Mit dem Quantil :math:`z` der Normalverteilung ergeben sich die Grenzen:
+
+        .. math::
+
+            |H| \\left(1 \\pm z\\,\\varepsilon\\left[|H|\\right]\\right), \\qquad
+            \\varphi \\pm z\\,\\sigma\\left[\\varphi\\right], \\qquad
+            \\gamma^2 \\left(1 \\pm z\\,\\varepsilon\\left[\\gamma^2\\right]\\right)
+
+        Die Näherungen gelten für kleine Fehler (etwa :math:`\\varepsilon < 0.2`); bei geringer Kohärenz
+        sind die Grenzen entsprechend breit. Wo die Kohärenz verschwindet (bzw. nicht definiert ist), sind auch
+        die Grenzen nicht definiert und werden auf `NaN` gesetzt.
+
+        Args:
+            confidence (float): Konfidenzniveau, z.B. 0.95 für 95 %
+
+        Note:
+            Erforderlich für die Berechnung sind:
+
+            - `self.psd1`, `self.psd2`, `self.csd` (ndarray) : Auto- und Kreuzleistungsspektren.
+            - `self.nAverages` (int) : Anzahl der gemittelten Blöcke aus `computePSD_CSD()`.
+            - `self.H` (ndarray) : Der berechnete Frequenzgang.
+
+            Die Methode berechnet jeweils untere und obere Grenze (Form `(2, nFreqs)`):
+
+            - `H_abs_bounds`     (ndarray): Grenzen des Betrags von :math:`H(f)`
+            - `H_phase_bounds`   (ndarray): Grenzen der Phase von :math:`H(f)` in rad
+            - `coherence_bounds` (ndarray): Grenzen der Kohärenz, begrenzt auf [0, 1]
+
+            Die Ergebnisse werden mit der `set_confidence_bounds()` Methode gespeichert. (Siehe Dokumentation)
+        '''
+        z = norm.ppf(0.5 + confidence / 2)
+        coherence, epsH, sigmaPhase, epsCoherence = _randomErrors(self.psd1, self.psd2, self.csd, self.nAverages)
+        absH    = np.abs(self.H)
+        phase   = np.angle(self.H)
+        H_abs_bounds        = np.stack([absH * np.clip(1 - z * epsH, 0, None), absH * (1 + z * epsH)])
+        H_phase_bounds      = np.stack([phase - z * sigmaPhase, phase + z * sigmaPhase])
+        coherence_bounds    = np.clip(np.stack([coherence * (1 - z * epsCoherence), coherence * (1 + z * epsCoherence)]), 0, 1)
+        undefined           = ~np.isfinite(epsH)
+        H_abs_bounds[:, undefined]      = np.nan
+        H_phase_bounds[:, undefined]    = np.nan
+        coherence_bounds[:, undefined]  = np.nan
+        self.set_confidence_bounds(H_abs_bounds, H_phase_bounds, coherence_bounds)
+
+    def set_confidence_bounds(self, H_abs_bounds, H_phase_bounds, coherence_bounds):
+        '''
+        Speichert die Konfidenzgrenzen von Frequenzgang und Kohärenz.
+
+        Args:
+            H_abs_bounds (array): Untere und obere Grenze von :math:`|H(f)|`
+            H_phase_bounds (array): Untere und obere Grenze der Phase von :math:`H(f)` in rad
+            coherence_bounds (array): Untere und obere Grenze der Kohärenz
+
+        Note:
+            Die Methode speichert die berecheten Größen in:
+
+            - `self.H_abs_bounds` (ndarray): Objektattribut zu den Grenzen des Betrags des Frequenzgangs
+            - `self.H_phase_bounds` (ndarray): Objektattribut zu den Grenzen der Phase des Frequenzgangs
+            - `self.coherence_bounds` (ndarray): Objektattribut zu den Grenzen der Kohärenz
+        '''
+        self.H_abs_bounds       = H_abs_bounds
+        self.H_phase_bounds     = H_phase_bounds
+        self.coherence_bounds   = coherence_bounds
+
+    def toResult(self, provenance=None, plots=None):
+        '''
+        Erzeugt ein unveränderliches Ergebnisobjekt mit den berechneten Größen.
+
+        Das Ergebnisobjekt (`ZweikanalResult`) enthält nur die abgeleiteten Arrays, die Parameter und
+        die Herkunftsangaben. Die Rohsignale und das Acoular-Objekt werden nicht übernommen, sodass sie
+        nach der Analyse freigegeben werden können.
+
+        Args:
+            provenance (dict): Herkunftsangaben, die im Ergebnis gespeichert werden (z.B. Dateinamen)
+            plots (dict): Darstellungsgrößen, die im Ergebnis gespeichert werden (siehe `ZweikanalResult`)
+
+        Returns:
+            ZweikanalResult : **Ergebnis**: die berechneten Größen als unveränderliches Objekt.
+        '''
+        return ZweikanalResult(
+            fs=self.fs,
+            delay=self.delay,
+            block_size=self.block_size,
+            n_averages=self.nAverages,
+            provenance=provenance,
+            plots=plots,
+            freqs=self.freqs,
+            psd1=self.psd1,
+            psd2=self.psd2,
+            csd=self.csd,
+            H=self.H,
+            coherence=self.coherence,
+            impulse_response=self.impulse_response,
+            time_axis=self.time_axis,
+            auto_corr1=self.auto_corr1,
+            auto_corr2=self.auto_corr2,
+            cross_corr=self.cross_corr,
+            lags_sec=self.lags_sec,
+            H_abs_bounds=self.H_abs_bounds,
+            H_phase_bounds=self.H_phase_bounds,
+            coherence_bounds=self.coherence_bounds,
+        )
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+
+import numpy as np
+
+def _readonly(arr):
+    '''
+    Gibt eine schreibgeschützte Sicht auf ein Array zurück, ohne die Daten zu kopieren.
+
+    Args:
+        arr (array): Beliebiges Array oder `None`
+
+    Returns:
+        ndarray : **view**: schreibgeschützte Sicht auf `arr` (bzw. `None`).
+    '''
+    if arr is None:
+        return None
+    view = np.asarray(arr).view()
+    view.flags.writeable = False
+    return view
+
+def _writeAtomic(path, write, mode='wb'):
+    '''
+    Schreibt eine Datei über eine temporäre Datei im selben Verzeichnis und ersetzt das Ziel anschließend atomar.
+
+    Bestehende Memory-Mappings (z.B. aus `ZweikanalResult.load()`) behalten so die alte Datei und werden nicht
+    durch ein Kürzen der Datei ungültig.
+
+    Args:
+        path (str): Zieldatei
+        write (callable): Funktion, die den Inhalt in das übergebene Dateiobjekt schreibt
+        mode (str): Modus, in dem die temporäre Datei geöffnet wird
+    '''
+    directory, name = os.path.split(path)
+    # Eindeutig je Prozess und Thread; Rechte wie bei einer normal angelegten Datei (umask)
+    tmpPath = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    fd = os.open(tmpPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            write(f)
+        os.replace(tmpPath, path)
+    except BaseException:
+        os.unlink(tmpPath)
+        raise
+
+class ZweikanalResult:
+    # Namen der Ergebnis-Arrays; jedes Array wird im Bundle als eigene `.npy`-Datei abgelegt
+    ARRAYS = ('freqs', 'psd1', 'psd2', 'csd', 'H', 'coherence', 'impulse_response', 'time_axis',
+              'auto_corr1', 'auto_corr2', 'cross_corr', 'lags_sec',
+              'H_abs_bounds', 'H_phase_bounds', 'coherence_bounds')
+    __slots__ = ARRAYS + ('fs', 'delay', 'block_size', 'n_averages', 'provenance', 'plots')
+    # Präfix der Darstellungsgrößen in `arrays()` und im Bundle
+    PLOTS_PREFIX = 'plots.'
+    # Version des Bundle-Formats (`save()`/`load()`); bei jeder Änderung an Dateien oder `meta.json` erhöhen
+    FORMAT_VERSION = 2
+    # Lesbare Formatversionen (Version 1 enthält keine Darstellungsgrößen)
+    SUPPORTED_FORMAT_VERSIONS = (1, 2)
+
+    def __init__(self, fs, delay=0.0, block_size=None, n_averages=None, provenance=None, plots=None, **arrays):
+        '''
+        Instanziert ein unveränderliches Ergebnisobjekt der Zweikanalanalyse.
+
+        Im Gegensatz zu `ZweikanalAnalyse` enthält das Objekt nur die abgeleiteten Größen, die
+        Analyseparameter und Angaben zur Herkunft, aber weder die Rohsignale noch das Acoular-Objekt.
+        Alle Arrays werden als schreibgeschützte Sichten ohne Kopie übernommen.
+
+        Zusätzlich kann das Objekt Darstellungsgrößen (`plots`, z.B. geglättete Beträge für das Dashboard) enthalten.
+        Sie werden einmal beim Erzeugen des Ergebnisses berechnet und wie die übrigen Arrays gespeichert bzw. geteilt,
+        sodass sie nicht in jeder Session erneut berechnet und kopiert werden.
+
+        Args:
+            fs (float): Abtastrate der analysierten Signale in Hz
+            delay (float): Kompensierte Laufzeit von Signal 2 gegenüber Signal 1 in Sekunden
+            block_size (int): Größe der FFT-Blöcke der Spektralschätzung
+            n_averages (int): Anzahl der gemittelten Blöcke der Spektralschätzung
+            provenance (dict): Herkunftsangaben (z.B. Dateinamen, Parameter); muss JSON-serialisierbar sein
+            plots (dict): Darstellungsgrößen, Name -> Array
+            **arrays: Die Ergebnis-Arrays, siehe `ZweikanalResult.ARRAYS`. Nicht angegebene Größen sind `None`.
+                Darstellungsgrößen können auch als `plots.<name>` übergeben werden (wie von `arrays()` zurückgegeben).
+        '''
+        plots = dict(plots or {})
+        for name in [name for name in arrays if name.startswith(self.PLOTS_PREFIX)]:
+            plots[name[len(self.PLOTS_PREFIX):]] = arrays.pop(name)
+        unknown = set(arrays) - set(self.ARRAYS)
+        if unknown:
+            raise TypeError(f"Unbekannte Ergebnisgrößen: {', '.join(sorted(unknown))}")
+        object.__setattr__(self, 'fs', fs)
+        object.__setattr__(self, 'delay', delay)
+        object.__setattr__(self, 'block_size', block_size)
+        object.__setattr__(self, 'n_averages', n_averages)
+        object.__setattr__(self, 'provenance', MappingProxyType(dict(provenance or {})))
+        object.__setattr__(self, 'plots', MappingProxyType({name: _readonly(arr) for name, arr in plots.items()}))
+        for name in self.ARRAYS:
+            object.__setattr__(self, name, _readonly(arrays.get(name)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} ist unveränderlich")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} ist unveränderlich")
+
+    def __getstate__(self):
+        return (self.meta(), self.arrays())
+
+    def __setstate__(self, state):
+        meta, arrays = state
+        ZweikanalResult.__init__(self, **meta, **arrays)
+
+    def arrays(self):
+        '''
+        Gibt alle vorhandenen Ergebnis-Arrays einschließlich der Darstellungsgrößen zurück.
+
+        Returns:
+            dict : **arrays**: Name -> schreibgeschütztes Array (ohne Größen, die `None` sind). Darstellungsgrößen
+            erscheinen als `plots.<name>`.
+        '''
+        arrays = {name: getattr(self, name) for name in self.ARRAYS if getattr(self, name) is not None}
+        arrays.update({self.PLOTS_PREFIX + name: arr for name, arr in self.plots.items()})
+        return arrays
+
+    def meta(self):
+        '''
+        Gibt Parameter und Herkunftsangaben als JSON-serialisierbares Dictionary zurück.
+
+        Returns:
+            dict : **meta**: `fs`, `delay`, `block_size`, `n_averages` und `provenance`.
+        '''
+        return dict(fs=float(self.fs),
+                    delay=float(self.delay),
+                    block_size=None if self.block_size is None else int(self.block_size),
+                    n_averages=None if self.n_averages is None else int(self.n_averages),
+                    provenance=dict(self.provenance))
+
+    def save(self, path):
+        '''
+        Speichert das Ergebnis als Bundle im Verzeichnis `path`.
+
+        Jedes Array wird unkomprimiert als `<name>.npy` abgelegt, Parameter, Herkunft und Formatversion in `meta.json`.
+        Dadurch lassen sich die Arrays mit `load()` ohne Kopie per Memory-Mapping einlesen. Alle Dateien werden
+        atomar ersetzt, sodass bereits geladene Ergebnisse desselben Bundles (auch das Objekt selbst) gültig bleiben;
+        `meta.json` wird zuletzt geschrieben.
+
+        Args:
+            path (str): Zielverzeichnis (wird bei Bedarf angelegt)
+        '''
+        os.makedirs(path, exist_ok=True)
+        for name, arr in self.arrays().items():
+            _writeAtomic(os.path.join(path, name + '.npy'), lambda f: np.save(f, arr, allow_pickle=False))
+        meta = self.meta()
+        meta['arrays'] = list(self.arrays())
+        meta['format_version'] = self.FORMAT_VERSION
+        _writeAtomic(os.path.join(path, 'meta.json'), lambda f: json.dump(meta, f, indent=2), mode='w')
+
+    def load(path, mmap=True):
+        '''
+        Lädt ein mit `save()` gespeichertes Bundle.
+
+        Args:
+            path (str): Verzeichnis des Bundles
+            mmap (bool): Arrays per Memory-Mapping (schreibgeschützt, ohne Kopie) statt in den Arbeitsspeicher laden
+
+        Returns:
+            ZweikanalResult : **Ergebnis**: das geladene Ergebnisobjekt.
+
+        Raises:
+            ValueError: Wenn das Bundle eine andere Formatversion hat.
+        '''
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        version = meta.pop('format_version', None)
+        if version not in ZweikanalResult.SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"Nicht unterstützte Formatversion des Bundles: {version} "
+                             f"(unterstützt: {', '.join(map(str, ZweikanalResult.SUPPORTED_FORMAT_VERSIONS))})")
+        arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+                  for name in meta.pop('arrays')}
+        return ZweikanalResult(**meta, **arrays)
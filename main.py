@@ -5,8 +5,12 @@ from bokeh.plotting import figure, curdoc
 from bokeh.palettes import Category10
 from bokeh.models import Button, ColumnDataSource, Slider, Div, FileInput
 from ZweikanalAnalyseClass import ZweikanalAnalyse
+from ResultStore import ResultStore, store, executor
+from functools import partial
 import base64
-import shutil
+import hashlib
+import html
+import io
 # import spectacoular
 import os
 
@@ -19,54 +23,116 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Pfade zu den Audiosignalen mit denen die Software gestartet wird
 Standard_signal1 = os.path.join(BASE_DIR, "Audiosignale", "signal1.wav")
 Standard_signal2 = os.path.join(BASE_DIR, "Audiosignale", "signal2.wav")
-# Pfade zu den aktuell zu analysierenden Signalen:
-Signal1_aktuell = os.path.join(BASE_DIR, "Audiosignale", "signal1_aktuell.wav")
-Signal2_aktuell = os.path.join(BASE_DIR, "Audiosignale", "signal2_aktuell.wav")
 
 
+def read_file(path: str):
+    '''
+    Liest den Inhalt einer Datei vollständig ein.
+
+    Args:
+        path (str): Pfad zur Datei.
+
+    Returns:
+        bytes: Der Dateiinhalt.
 
-def calculate_all(signal1Path: str = None, signal2Path: str = None):
     '''
-    Führt die gesamte Analyse durch und gibt ein ZweikanalAnalyse-Objekt zurück.
+    with open(path, "rb") as f:
+        return f.read()
+
+def calculate_all(signal1Data: bytes = None, signal2Data: bytes = None, downsampling_factor: int = None,
+                  target_error: float = None, band: tuple = None):
+    '''
+    Führt die gesamte Analyse durch und gibt die berechneten Größen zurück.
+
+    Die Ergebnisse werden im serverweiten Ergebnisspeicher (`ResultStore.store`) abgelegt. Öffnen mehrere
+    Sessions dieselben Signale mit denselben Parametern, wird nur einmal gerechnet und alle Sessions teilen
+    sich die schreibgeschützten Arrays im Shared Memory. Schlüssel und Analyse beruhen auf denselben,
+    bereits eingelesenen Bytes. Der Schlüssel hängt nur vom Inhalt und den Parametern ab, nicht von den
+    Dateinamen; diese gehören zur jeweiligen Session (siehe `session_provenance()`).
 
     Args:
-        signal1Path (str): Pfad zur WAV-Datei des ersten Signals.
-        signal2Path (str): Pfad zur WAV-Datei des zweiten Signals.
+        signal1Data (bytes): Inhalt der WAV-Datei des ersten Signals.
+        signal2Data (bytes): Inhalt der WAV-Datei des zweiten Signals.
+        downsampling_factor (int): Downsampling Faktor (Standard: Wert des Sliders).
+        target_error (float): Zielfehler von :math:`|H(f)|` für die adaptive Mittelung (Standard: alle Blöcke mitteln,
+            siehe `ZweikanalAnalyse.computePSD_CSD()`).
+        band (tuple): Frequenzband `(fmin, fmax)` in Hz, in dem `target_error` erreicht werden muss.
 
     Returns:
-        ZweikanalAnalyse: Ein Objekt der Klasse ZweikanalAnalyse mit den berechneten Werten.
+        ZweikanalResult: Ein unveränderliches Ergebnisobjekt mit den berechneten Größen (siehe `compute_results()`).
 
     Hinweis:
-        Wenn keine Dateien ausgewählt sind i.e. Signal1Path und Signal2Path None sind, werden Standardsignale aus dem Projektordner verwendet.
+        Wenn keine Dateien ausgewählt sind i.e. signal1Data und signal2Data None sind, werden Standardsignale aus dem Projektordner verwendet.
+
+    '''
+    # Liest die Standardsignale (nur für die Initialisierung) ein
+    if signal1Data is None:
+        signal1Data = read_file(Standard_signal1)
+    if signal2Data is None:
+        signal2Data = read_file(Standard_signal2)
+    if downsampling_factor is None:
+        downsampling_factor = slider_downsampling.value
+
+    key = ResultStore.makeKey([signal1Data, signal2Data], downsampling_factor=downsampling_factor,
+                              target_error=target_error, band=band)
+    provenance = dict(
+        key=key,
+        signal1_sha256=hashlib.sha256(signal1Data).hexdigest(),
+        signal2_sha256=hashlib.sha256(signal2Data).hexdigest(),
+        downsampling_factor=downsampling_factor,
+        target_error=target_error,
+        band=None if band is None else list(band),
+    )
+    return store.getOrCompute(key, lambda: compute_results(signal1Data, signal2Data, downsampling_factor, provenance,
+                                                           target_error, band))
+
+def compute_results(signal1Data: bytes, signal2Data: bytes, downsampling_factor: int, provenance: dict = None,
+                    target_error: float = None, band: tuple = None):
+    '''
+    Berechnet alle Größen der Zweikanalanalyse für ein Signalpaar.
+
+    Ist `target_error` gesetzt, werden die Spektren adaptiv aus einer blockweise lesenden Quelle
+    (`ZweikanalAnalyse.streamWAV()`) gemittelt, die nach Erreichen des Zielfehlers nicht weiter dekodiert.
+    Die Korrelationen benötigen weiterhin die vollständigen Signale.
+
+    Args:
+        signal1Data (bytes): Inhalt der WAV-Datei des ersten Signals.
+        signal2Data (bytes): Inhalt der WAV-Datei des zweiten Signals.
+        downsampling_factor (int): Downsampling Faktor.
+        provenance (dict): Herkunftsangaben für das Ergebnis (Schlüssel, Dateihashes und Parameter).
+        target_error (float): Zielfehler von :math:`|H(f)|` für die adaptive Mittelung (`None`: alle Blöcke mitteln).
+        band (tuple): Frequenzband `(fmin, fmax)` in Hz für `target_error`.
+
+    Returns:
+        ZweikanalResult: Die berechneten Größen ohne die Rohsignale.
 
     '''
-    # Stellt die Pfade zu den Standardsignalen (nur für die Initialisierung) ein
-    if signal1Path is None:
-        signal1Path = Standard_signal1
-    if signal2Path is None:
-        signal2Path = Standard_signal2
-    
     # Lade die Signale
-    ts,fs = ZweikanalAnalyse.loadSignalWAV(signal1Path, signal2Path)
+    ts,fs,delay = ZweikanalAnalyse.loadSignalWAV(io.BytesIO(signal1Data), io.BytesIO(signal2Data))
     sig1 = ts.data[:,0]
     sig2 = ts.data[:,1]
 
     # Downsampling der Signale
-    downsampling_factor = slider_downsampling.value
     fsReduced           = ts.sample_freq/downsampling_factor
     nSampleReduced      = int(ts.num_samples/downsampling_factor)
     sig1Reduced         = resample(sig1, nSampleReduced)
     sig2Reduced         = resample(sig2, nSampleReduced)
 
-    Analyse = ZweikanalAnalyse(sig1Reduced,sig2Reduced,fsReduced)               # ZweikanalAnalyse Objekt initalisieren
+    Analyse = ZweikanalAnalyse(sig1Reduced,sig2Reduced,fsReduced,delay/fs)      # ZweikanalAnalyse Objekt initalisieren (Laufzeit in s)
     Analyse.computeCorrelations()       # Auto- und Kreuzkorrelation berechnen
-    Analyse.computePSD_CSD()            # Auto- und Kreuzleistungsspektren berechnen
+    if target_error is None:
+        Analyse.computePSD_CSD()        # Auto- und Kreuzleistungsspektren berechnen
+    else:
+        # Adaptiv mitteln; die Quelle dekodiert die Dateien nur so weit wie nötig
+        source = ZweikanalAnalyse.streamWAV(io.BytesIO(signal1Data), io.BytesIO(signal2Data), delay, downsampling_factor)
+        Analyse.computePSD_CSD(target_error=target_error, band=band, source=source)
     Analyse.computeFrequencyResponse()  # Übertragungsfunktion berechnen
     Analyse.computeCoherence()          # Kohärenz berechnen
     Analyse.computeImpulseResponse()    # Impulsantwort berechnen
-    Analyse.time_axis = np.arange(len(Analyse.impulse_response))/Analyse.fs     # Zeitachse für die Impulsantwort
-    Analyse.lags_sec = Analyse.correlationLags / Analyse.tsAcoular.sample_freq  # Umwandlung der Lags in Sekunden
-    return Analyse
+    Analyse.computeConfidenceBounds()   # Konfidenzgrenzen von H und Kohärenz berechnen
+    # Nur die abgeleiteten Größen weitergeben, nicht die Rohsignale; die Darstellungsgrößen
+    # werden hier einmal berechnet und von allen Sessions gemeinsam genutzt
+    return Analyse.toResult(provenance=provenance, plots=plot_arrays(Analyse))
 
 def smooth(data, window_length=21, polyorder=3):
     '''
@@ -85,6 +151,105 @@ def smooth(data, window_length=21, polyorder=3):
         window_length = max(3, len(data) // 2 * 2 + 1)
     return savgol_filter(data, window_length, polyorder)
 
+def plot_arrays(Analyse):
+    '''
+    Berechnet die Darstellungsgrößen des Dashboards (Beträge, geglättete Kurven, Konfidenzbänder).
+
+    Args:
+        Analyse (ZweikanalAnalyse): Die vollständig berechnete Analyse.
+
+    Returns:
+        dict: Name -> Array, wird als `plots` im Ergebnis gespeichert (siehe `source_data()`).
+
+    '''
+    # Nicht definierte Konfidenzgrenzen (verschwindende Kohärenz) als NaN, damit das Band dort unterbrochen wird
+    H_bounds    = np.where(np.isfinite(Analyse.H_abs_bounds), Analyse.H_abs_bounds, np.nan)
+    coh_bounds  = np.where(np.isfinite(Analyse.coherence_bounds), Analyse.coherence_bounds, np.nan)
+    return dict(
+        psd1_abs=np.abs(Analyse.psd1),                  # Leistungsspektrum NICHT glätten!
+        psd2_abs=np.abs(Analyse.psd2),
+        csd_abs=np.abs(Analyse.csd),
+        csd_phase=smooth(np.angle(Analyse.csd)),        # Kreuzphase glätten
+        cross_lags_sec=Analyse.lags_sec - Analyse.delay,# Kreuzkorrelation auf die unkompensierte Laufzeit beziehen
+        auto_corr1=smooth(Analyse.auto_corr1),          # Korrelationen glätten
+        auto_corr2=smooth(Analyse.auto_corr2),
+        cross_corr=smooth(Analyse.cross_corr),
+        H_abs=smooth(np.abs(Analyse.H)),                # Übertragungsfunktion glätten
+        H_lower=H_bounds[0],                            # Konfidenzgrenzen ungeglättet
+        H_upper=H_bounds[1],
+        impulse_response=smooth(np.real(Analyse.impulse_response)),  # Impulsantwort glätten
+        coherence=smooth(np.abs(Analyse.coherence)),    # Kohärenz glätten
+        coh_lower=coh_bounds[0],
+        coh_upper=coh_bounds[1],
+    )
+
+def source_data(Analyse):
+    '''
+    Stellt die Daten der Bokeh-Datenquellen aus einem Ergebnis zusammen.
+
+    Es werden nur Sichten auf die (geteilten, schreibgeschützten) Arrays des Ergebnisses verwendet, es wird
+    also je Session nichts neu berechnet oder kopiert.
+
+    Args:
+        Analyse (ZweikanalResult): Das Ergebnis der Analyse.
+
+    Returns:
+        dict: Name der Datenquelle -> Daten der Datenquelle.
+
+    '''
+    plots = Analyse.plots
+    return dict(
+        power_abs=dict(freqs=Analyse.freqs, auto1=plots['psd1_abs'], auto2=plots['psd2_abs'], cross=plots['csd_abs']),
+        power_phase=dict(freqs=Analyse.freqs, cross=plots['csd_phase']),
+        correlation=dict(lags_sec=Analyse.lags_sec, cross_lags_sec=plots['cross_lags_sec'],
+                         auto_corr1=plots['auto_corr1'], auto_corr2=plots['auto_corr2'], cross_corr=plots['cross_corr']),
+        transfer=dict(freqs=Analyse.freqs, H=plots['H_abs'], H_lower=plots['H_lower'], H_upper=plots['H_upper']),
+        impulse=dict(time_axis=Analyse.time_axis, h=plots['impulse_response']),
+        coherence=dict(freqs=Analyse.freqs, coh=plots['coherence'], coh_lower=plots['coh_lower'], coh_upper=plots['coh_upper']),
+    )
+
+def session_provenance(Analyse, names):
+    '''
+    Ergänzt die Herkunftsangaben eines (geteilten) Ergebnisses um die Dateinamen dieser Session.
+
+    Args:
+        Analyse (ZweikanalResult): Das Ergebnis der Analyse.
+        names (list): Ursprüngliche Dateinamen des ersten und zweiten Signals.
+
+    Returns:
+        dict: Herkunftsangaben des Ergebnisses mit `signal1` und `signal2`.
+
+    '''
+    return dict(Analyse.provenance, signal1=names[0], signal2=names[1])
+
+def provenance_text(provenance):
+    '''
+    Erzeugt den Anzeigetext zu den analysierten Dateien.
+
+    Args:
+        provenance (dict): Herkunftsangaben (siehe `session_provenance()`).
+
+    Returns:
+        str: HTML-Text für das Herkunfts-Div.
+
+    '''
+    return (f"<p>Analysierte Dateien: <b>{html.escape(provenance['signal1'])}</b> "
+            f"(SHA-256 {provenance['signal1_sha256'][:12]}…), "
+            f"<b>{html.escape(provenance['signal2'])}</b> (SHA-256 {provenance['signal2_sha256'][:12]}…)</p>")
+
+def delay_text(Analyse):
+    '''
+    Erzeugt den Anzeigetext zur geschätzten und kompensierten Laufzeit zwischen den Kanälen.
+
+    Args:
+        Analyse (ZweikanalResult): Das Ergebnis der Analyse.
+
+    Returns:
+        str: HTML-Text für das Laufzeit-Div.
+
+    '''
+    return f"<p>Geschätzte Laufzeit Signal 2 gegenüber Signal 1: <b>{Analyse.delay * 1e3:.3f} ms</b> (vor der Spektralanalyse kompensiert)</p>"
+
 # header
 header = Div(
     text =
@@ -101,39 +266,49 @@ header = Div(
 file_input_0 = FileInput(accept=".wav")
 file_input_1 = FileInput(accept=".wav")
 
-def save_uploaded_file(file_input, filename):
+# Aktuell ausgewählte Signale dieser Session (Dateiinhalt), zu Beginn die Standardsignale.
+# main.py wird für jede Session neu ausgeführt, die Liste ist also nicht zwischen Sessions geteilt.
+selected_signals = [read_file(Standard_signal1), read_file(Standard_signal2)]
+# Ursprüngliche Dateinamen der ausgewählten Signale (für die Herkunftsangaben des Ergebnisses)
+selected_names = [os.path.basename(Standard_signal1), os.path.basename(Standard_signal2)]
+
+def save_uploaded_file(file_input, index):
     '''
-    Speichert die hochgeladene Datei in einem Arbeits-Verzeichnis.
+    Übernimmt die hochgeladene Datei als aktuell ausgewähltes Signal dieser Session.
+
+    Die Datei wird nicht auf die Festplatte geschrieben, damit sich gleichzeitige Sessions ihre
+    Signale nicht gegenseitig überschreiben.
 
     Args:
         file_input (FileInput): Das Bokeh FileInput Widget.
-        filename (str): Der Pfad, unter dem die Datei gespeichert werden soll.
+        index (int): 0 für das erste, 1 für das zweite Signal.
 
     '''
     if file_input.value:
-        # Decode base64 and save to file
-        file_bytes = base64.b64decode(file_input.value)
-        with open(filename, "wb") as f:
-            f.write(file_bytes)
+        # Decode base64
+        selected_signals[index] = base64.b64decode(file_input.value)
 
 # Callbacks für die FileInputs
 def on_file_input_0_change(attr, old, new):
     """
     Callback, der beim Hochladen der ersten Datei aufgerufen wird.
-    Speichert die Datei lokal in der Projekt-directory in einem Ordner namens "Audiosignale".
+    Übernimmt die Datei als erstes Signal dieser Session.
     """
-    save_uploaded_file(file_input_0, Signal1_aktuell)
+    save_uploaded_file(file_input_0, 0)
 
 def on_file_input_1_change(attr, old, new):
     """
     Callback, der beim Hochladen der zweiten Datei aufgerufen wird.
-    Speichert die Datei lokal in der Projekt-directory in einem Ordner namens "Audiosignale".
+    Übernimmt die Datei als zweites Signal dieser Session.
     """
 
-    save_uploaded_file(file_input_1, Signal2_aktuell)
+    save_uploaded_file(file_input_1, 1)
 
 file_input_0.on_change("value", on_file_input_0_change)
 file_input_1.on_change("value", on_file_input_1_change)
+# Der Client setzt `filename` erst nach `value`, daher wird der Name in einem eigenen Callback übernommen
+file_input_0.on_change("filename", lambda attr, old, new: selected_names.__setitem__(0, new))
+file_input_1.on_change("filename", lambda attr, old, new: selected_names.__setitem__(1, new))
 
 # Downsampling Slider
 slider_downsampling = Slider(title="Downsampling Faktor", start=1, end=20, value=1, step=1)
@@ -142,46 +317,22 @@ slider_downsampling = Slider(title="Downsampling Faktor", start=1, end=20, value
 my_button = Button(label="Analyse starten", button_type="success")
 my_button.on_click(lambda: on_button_click())
 
-# kopiere die Signale signal1.wav und signal2.wav und speichere sie als signal1_aktuell.wav und signal2_aktuell.wav
-shutil.copy(Standard_signal1, Signal1_aktuell)
-shutil.copy(Standard_signal2, Signal2_aktuell)
-
-# Pfad zu den Audiosignalen
-signal1Path = Signal1_aktuell
-signal2Path = Signal2_aktuell
-
 # Berechnung der Analyse für die default-Signale
-Analyse = calculate_all(signal1Path, signal2Path)
-
-# Initialisierung der Datenquellen
-power_source_abs = ColumnDataSource(data=dict(
-    freqs=Analyse.freqs,
-    auto1=np.abs(Analyse.psd1),                # Leistungsspektrum NICHT glätten!
-    auto2=np.abs(Analyse.psd2),
-    cross=np.abs(Analyse.csd)
-))
-power_source_phase = ColumnDataSource(data=dict(
-    freqs=Analyse.freqs,
-    cross=smooth(np.angle(Analyse.csd))        # Kreuzphase glätten
-))
-correlation_source = ColumnDataSource(data=dict(
-    lags_sec=Analyse.lags_sec,
-    auto_corr1=smooth(Analyse.auto_corr1),     # Korrelationen glätten
-    auto_corr2=smooth(Analyse.auto_corr2),
-    cross_corr=smooth(Analyse.cross_corr)
-))
-transfer_source = ColumnDataSource(data=dict(
-    freqs=Analyse.freqs,
-    H=smooth(np.abs(Analyse.H))                # Übertragungsfunktion glätten
-))
-impulse_source = ColumnDataSource(data=dict(
-    time_axis=Analyse.time_axis,
-    h=smooth(np.real(Analyse.impulse_response))# Impulsantwort glätten
-))
-coherence_source = ColumnDataSource(data=dict(
-    freqs=Analyse.freqs,
-    coh=smooth(np.abs(Analyse.coherence))      # Kohärenz glätten
-))
+Analyse = calculate_all(*selected_signals)
+
+# Initialisierung der Datenquellen (Sichten auf die geteilten Arrays des Ergebnisses)
+data = source_data(Analyse)
+power_source_abs    = ColumnDataSource(data=data['power_abs'])
+power_source_phase  = ColumnDataSource(data=data['power_phase'])
+correlation_source  = ColumnDataSource(data=data['correlation'])
+transfer_source     = ColumnDataSource(data=data['transfer'])
+impulse_source      = ColumnDataSource(data=data['impulse'])
+coherence_source    = ColumnDataSource(data=data['coherence'])
+
+# Anzeige der kompensierten Laufzeit
+delay_div = Div(text=delay_text(Analyse), styles={"font-size": "1.2em"})
+# Herkunft der angezeigten Ergebnisse; die Dateinamen gehören zur Session, nicht zum geteilten Ergebnis
+provenance_div = Div(text=provenance_text(session_provenance(Analyse, selected_names)), styles={"font-size": "1.2em"})
 
 # Bokeh Plots
 power_fig_abs = figure(title="Leistungs- und Kreuzspektren (Absolutwerte)", x_axis_label="Frequenz [Hz]", y_axis_label="Amplitude", y_axis_type="log")
@@ -198,12 +349,17 @@ power_fig_abs.line('freqs', 'cross', source=power_source_abs, legend_label="Kreu
 
 correlation_fig.line('lags_sec', 'auto_corr1', source=correlation_source, legend_label="Autokorrelation Signal 1")
 correlation_fig.line('lags_sec', 'auto_corr2', source=correlation_source, legend_label="Autokorrelation Signal 2", color=Category10[5][1])
-correlation_fig.line('lags_sec', 'cross_corr', source=correlation_source, legend_label="Kreuzkorrelation", color=Category10[5][2])
+correlation_fig.line('cross_lags_sec', 'cross_corr', source=correlation_source, legend_label="Kreuzkorrelation", color=Category10[5][2])
 
 power_fig_phase.line('freqs', 'cross', source=power_source_phase, legend_label="Kreuzphase", color=Category10[5][2])
-transfer_fig.line('freqs', 'H', source=transfer_source, legend_label="Magnitude", color=Category10[5][0])
+transfer_fig.varea('freqs', 'H_lower', 'H_upper', source=transfer_source, legend_label="95 %-Konfidenzbereich", color=Category10[5][0], fill_alpha=0.2)
+transfer_line = transfer_fig.line('freqs', 'H', source=transfer_source, legend_label="Magnitude", color=Category10[5][0])
 impulse_fig.line('time_axis', 'h', source=impulse_source, legend_label="Impulsantwort", color=Category10[5][0])
-coherence_fig.line('freqs', 'coh', source=coherence_source, legend_label="Kohärenz", color=Category10[5][0])
+coherence_fig.varea('freqs', 'coh_lower', 'coh_upper', source=coherence_source, legend_label="95 %-Konfidenzbereich", color=Category10[5][0], fill_alpha=0.2)
+coherence_line = coherence_fig.line('freqs', 'coh', source=coherence_source, legend_label="Kohärenz", color=Category10[5][0])
+# Bei geringer Kohärenz sind die Grenzen sehr breit; die Achsen richten sich daher nur nach den Kurven
+transfer_fig.y_range.renderers = [transfer_line]
+coherence_fig.y_range.renderers = [coherence_line]
 
 # Einstellung der plots
 for fig in [power_fig_abs, transfer_fig, impulse_fig, coherence_fig, correlation_fig]:
@@ -214,46 +370,39 @@ for fig in [power_fig_abs, transfer_fig, impulse_fig, coherence_fig, correlation
 def on_button_click():
     '''
     Callback-Funktion, die ausgeführt wird, wenn der Button geklickt wird.
-    Sie lädt die aktuell ausgewählten Signale und berechnet alle Analysewerte neu.
+    Sie startet die Analyse der aktuell ausgewählten Signale im Hintergrund, damit andere Sessions
+    nicht blockiert werden. Die Datenquellen werden nach Abschluss mit `update_sources()` aktualisiert.
 
     '''
-    # Lade die aktuell ausgewählten Signale
-    signal1Path = Signal1_aktuell
-    signal2Path = Signal2_aktuell
-    Analyse = calculate_all(signal1Path,signal2Path)
+    # Inhalte der aktuell ausgewählten Signale (unveränderliche bytes, sicher im Hintergrund nutzbar)
+    signal1Data, signal2Data = selected_signals
+    names = list(selected_names)
+    my_button.disabled = True
+    job = executor.submit(calculate_all, signal1Data, signal2Data, slider_downsampling.value)
+    job.add_done_callback(lambda job: doc.add_next_tick_callback(partial(update_sources, job, names)))
+
+def update_sources(job, names):
+    '''
+    Aktualisiert die Datenquellen mit dem Ergebnis einer abgeschlossenen Analyse.
 
-    time_axis = np.arange(len(Analyse.impulse_response))/Analyse.fs
-    lags_sec = Analyse.correlationLags / Analyse.tsAcoular.sample_freq
+    Args:
+        job (Future): Die im Hintergrund ausgeführte Analyse (siehe `calculate_all()`).
+        names (list): Dateinamen der analysierten Signale zum Zeitpunkt des Starts.
+
+    '''
+    my_button.disabled = False
+    Analyse = job.result()
+    delay_div.text = delay_text(Analyse)
+    provenance_div.text = provenance_text(session_provenance(Analyse, names))
 
     # Update der Datenquellen
-    power_source_abs.data = dict(
-        freqs=Analyse.freqs,
-        auto1=np.abs(Analyse.psd1),                # Leistungsspektrum NICHT glätten!
-        auto2=np.abs(Analyse.psd2),
-        cross=np.abs(Analyse.csd)
-    )
-    power_source_phase.data = dict(
-        freqs=Analyse.freqs,
-        cross=smooth(np.angle(Analyse.csd))        # Kreuzphase glätten
-    )
-    correlation_source.data = dict(
-        lags_sec=lags_sec,
-        auto_corr1=smooth(Analyse.auto_corr1),     # Korrelationen glätten
-        auto_corr2=smooth(Analyse.auto_corr2),
-        cross_corr=smooth(Analyse.cross_corr)
-    )
-    transfer_source.data = dict(
-        freqs=Analyse.freqs,
-        H=smooth(np.abs(Analyse.H))                # Übertragungsfunktion glätten
-    )
-    impulse_source.data = dict(
-        time_axis=time_axis,
-        h=smooth(np.real(Analyse.impulse_response))# Impulsantwort glätten
-    )
-    coherence_source.data = dict(
-        freqs=Analyse.freqs,
-        coh=smooth(np.abs(Analyse.coherence))      # Kohärenz glätten
-    )
+    data = source_data(Analyse)
+    power_source_abs.data   = data['power_abs']
+    power_source_phase.data = data['power_phase']
+    correlation_source.data = data['correlation']
+    transfer_source.data    = data['transfer']
+    impulse_source.data     = data['impulse']
+    coherence_source.data   = data['coherence']
 
 # Layout der Bokeh-App
 power_fig_abs.legend.title = "Leistungsspektren"
@@ -266,6 +415,8 @@ layout = column(
     slider_downsampling,
     my_button,
     Div(text="<h2>Analyseergebnisse</h2>", styles={"font-size": "1.5em"}),
+    provenance_div,
+    delay_div,
     Div(text="<h3>Leistungs- und Kreuzspektren</h3>", styles={"font-size": "1.5em"}),
     row(power_fig_abs, power_fig_phase),
     Div(text="<h3>weitere Größen</h3>", styles={"font-size": "1.5em"}),
@@ -275,7 +426,8 @@ layout = column(
     sizing_mode = "stretch_width"
 )
 
-curdoc().add_root(layout)
+doc = curdoc()
+doc.add_root(layout)
 
 #####################################################################################
 
@@ -298,6 +450,5 @@ curdoc().add_root(layout)
 #       signal1.wav and signal2.wav
 #       noise_a.wav and noise_b.wav
 #       blue_audio.wav and blue_audio_muffled.wav
-# The default files are already copied to the Audiosignale directory.
 
 #####################################################################################
\ No newline at end of file
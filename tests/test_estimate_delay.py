@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import correlate
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ZweikanalAnalyseClass import ZweikanalAnalyse
+
+def readPair(name1, name2):
+    signal1, _ = sf.read(os.path.join(BASE_DIR, "Audiosignale", name1))
+    signal2, _ = sf.read(os.path.join(BASE_DIR, "Audiosignale", name2))
+    n = min(len(signal1), len(signal2))
+    return signal1[:n], signal2[:n]
+
+def exhaustiveDelay(signal1, signal2, max_delay):
+    '''
+    Referenz: Laufzeit aus der vollständigen Kreuzkorrelation mit voller Abtastrate.
+    '''
+    n       = len(signal1)
+    cc      = correlate(signal1, signal2, mode='full', method='fft')
+    lags    = np.arange(-n + 1, n)
+    valid   = np.abs(lags) <= max_delay
+    return int(-lags[valid][np.argmax(np.abs(cc[valid]))])
+
+class EstimateDelayTest(unittest.TestCase):
+    def test_matchesExhaustiveSearch(self):
+        # Breitbandiges Rauschen: die Grobsuche allein landet hier auf einer Nebenspitze
+        signal1, signal2 = readPair("noise_a.wav", "noise_b.wav")
+        expected = exhaustiveDelay(signal1, signal2, len(signal1) // 20)
+        self.assertEqual(ZweikanalAnalyse.estimateDelay(signal1, signal2), expected)
+
+    def test_periodicSignalsAreNotCompensated(self):
+        # Sinus mit Phasenverschiebung: keine eindeutige Laufzeit
+        signal1, signal2 = readPair("signal1.wav", "signal2.wav")
+        self.assertEqual(ZweikanalAnalyse.estimateDelay(signal1, signal2), 0)
+
+    def test_independentNoiseIsNotCompensated(self):
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            signal1 = rng.standard_normal(96000)
+            signal2 = rng.standard_normal(96000)
+            self.assertEqual(ZweikanalAnalyse.estimateDelay(signal1, signal2), 0)
+
+    def test_syntheticDelays(self):
+        rng     = np.random.default_rng(1)
+        signal1 = rng.standard_normal(200000)
+        for delay in (0, 7, -13, 3001, -4500):
+            signal2 = np.roll(signal1, delay) + 0.3 * rng.standard_normal(len(signal1))
+            self.assertEqual(ZweikanalAnalyse.estimateDelay(signal1, signal2), delay)
+
+if __name__ == "__main__":
+    unittest.main()